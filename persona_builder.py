@@ -1,23 +1,35 @@
 import os
 import re
-import json
 import time
+import asyncio
+import hashlib
 import logging
 import argparse
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+import functools
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Any, Iterator, Tuple
 from dataclasses import dataclass, asdict
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin
 
-import requests
+import aiohttp
+import orjson
+import groq
 from bs4 import BeautifulSoup
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import BaseOutputParser
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnablePassthrough
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 
 load_dotenv()
@@ -34,18 +46,88 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_STRIKE_RE = re.compile(r'~~(.*?)~~')
+_BLANKLINES_RE = re.compile(r'\n\s*\n')
+
+# Group 1 is the canonical profile URL, group 2 the username.
+_REDDIT_USER_RE = re.compile(
+    r'^(https?://(?:www\.|old\.)?reddit\.com/user/([^/?#]+))/?(?:[?#].*)?$'
+)
+
+# Post bodies are cut at scrape time; the LLM only ever sees the first
+# _LLM_CONTENT_CHARS characters of each one.
+_MAX_CONTENT_CHARS = 2000
+_LLM_CONTENT_CHARS = 800
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Formatted LLM inputs kept per PersonaGenerator, keyed by _posts_digest.
+_FORMAT_CACHE_SIZE = 128
+
+_POST_TEMPLATE = (
+    "=== {post_type} {index} ===\n"
+    "Title: {title}\n"
+    "Subreddit: r/{subreddit}\n"
+    "Content: {content}\n"
+    "Timestamp: {timestamp}\n"
+    "Upvotes: {upvotes}\n"
+    "URL: {url}\n"
+)
+
+# Display headings for the citation categories requested in the prompt.
+_CITATION_LABELS = {
+    category: category.upper().replace('_', ' ')
+    for category in (
+        'interests', 'personality_traits', 'goals', 'frustrations', 'occupation',
+        'location', 'age_range', 'status', 'tier', 'archetype', 'communication_style',
+        'technology_comfort', 'social_media_behavior', 'motivations', 'behavior_habits',
+        'personality_percentages',
+    )
+}
+
+
+def _match_profile_url(profile_url: str) -> Optional[re.Match]:
+    """Match a Reddit profile URL against _REDDIT_USER_RE, ignoring surrounding whitespace."""
+    return _REDDIT_USER_RE.match(profile_url.strip())
+
+
+def _parse_username(profile_url: str) -> Optional[str]:
+    """Return the username from a Reddit profile URL, or None if invalid."""
+    match = _match_profile_url(profile_url)
+    return match.group(2) if match else None
+
+
+def _posts_digest(posts: List["RedditPost"]) -> str:
+    """Return a BLAKE2b digest over every post field used in the LLM input."""
+    digest = hashlib.blake2b()
+    for post in posts:
+        for value in (post.post_type, post.title, post.subreddit, post.content,
+                      post.timestamp, post.upvotes, post.url):
+            digest.update(str(value).encode('utf-8'))
+            digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=1024)
+def _fmt_ts(ts: int) -> str:
+    """Format a Unix timestamp as local time for display."""
+    return time.strftime(_TIMESTAMP_FORMAT, time.localtime(ts))
+
+
+@dataclass(slots=True, frozen=True)
 class RedditPost:
     """Data class for Reddit posts and comments."""
     title: str
     content: str
     subreddit: str
     url: str
-    timestamp: str
+    timestamp: int  # raw created_utc; format with _fmt_ts for display
     upvotes: int
     post_type: str  
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PersonalityTraits:
     """Data class for MBTI-style personality traits (as percentages)."""
     introversion: int  
@@ -54,7 +136,7 @@ class PersonalityTraits:
     perceiving: int    
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Motivations:
     """Data class for user motivations with intensity scores."""
     primary_motivation: str
@@ -92,28 +174,50 @@ class UserPersonaModel(BaseModel):
     citations: Dict[str, List[str]] = Field(description="Citations for each characteristic")
 
 
-@dataclass
-class UserPersona:
-    """Enhanced data class for user persona information."""
-    name: str
-    age_range: str
-    location: str
-    occupation: str
-    status: str
-    tier: str
-    archetype: str
-    interests: List[str]
-    personality_traits: List[str]
-    goals: List[str]
-    frustrations: List[str]
-    preferred_subreddits: List[str]
-    communication_style: str
-    technology_comfort: str
-    social_media_behavior: str
-    motivations: Dict[str, int]
-    behavior_habits: List[str]
-    personality_percentages: Dict[str, int]
-    citations: Dict[str, List[str]]
+def _iter_json_objects(text: str) -> Iterator[str]:
+    """Yield each outermost balanced ``{...}`` block in text, in order.
+
+    Single forward pass keeping a stack of open-brace positions; braces
+    inside JSON strings (including escaped quotes) are ignored. A ``{`` that
+    never closes (a stray brace in prose, or output truncated mid-object)
+    is skipped without rescanning, and the balanced blocks inside it are
+    yielded instead.
+    """
+    open_starts: List[int] = []
+    # Balanced blocks not (yet) known to be nested in another one.
+    closed: List[Tuple[int, int]] = []
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"' or char == '\n':
+                # JSON strings cannot contain raw newlines; a newline means
+                # the quote was prose, so don't let it swallow later braces.
+                in_string = False
+        elif char == '{':
+            open_starts.append(i)
+        elif not open_starts:
+            continue
+        elif char == '"':
+            in_string = True
+        elif char == '}':
+            start = open_starts.pop()
+            while closed and closed[-1][0] > start:
+                closed.pop()
+            if open_starts:
+                closed.append((start, i))
+            else:
+                closed.clear()
+                yield text[start:i + 1]
+    
+    if open_starts:
+        logger.warning("Unbalanced braces in LLM output; it may be truncated")
+    for start, end in closed:
+        yield text[start:end + 1]
 
 
 class PersonaOutputParser(BaseOutputParser[UserPersonaModel]):
@@ -123,14 +227,24 @@ class PersonaOutputParser(BaseOutputParser[UserPersonaModel]):
         """Parse the LLM output into structured persona data."""
         try:
          
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                return UserPersonaModel.model_validate(data)
-            else:
-               
-                return self._fallback_parse(text)
-        except (json.JSONDecodeError, Exception) as e:
+            # Skip stray brace blocks in surrounding prose (e.g. "{name}")
+            # and objects that decode but are not a full persona.
+            for json_text in _iter_json_objects(text):
+                try:
+                    data = orjson.loads(json_text)
+                except orjson.JSONDecodeError:
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                try:
+                    return UserPersonaModel.model_validate(data)
+                except ValidationError as e:
+                    # e.g. an echoed fragment like {"introversion": 65} before the persona
+                    logger.warning(f"Skipping JSON object that is not a persona: {e.error_count()} validation errors")
+            
+            logger.warning("No persona JSON object found in LLM output")
+            return self._fallback_parse(text)
+        except Exception as e:
             logger.warning(f"JSON parsing failed: {e}. Using fallback parsing.")
             return self._fallback_parse(text)
     
@@ -161,19 +275,41 @@ class PersonaOutputParser(BaseOutputParser[UserPersonaModel]):
 
 
 class RedditScraper:
-    """Reddit profile scraper class."""
+    """Reddit profile scraper class.
+
+    Must be used as an async context manager so the underlying
+    ``aiohttp.ClientSession`` is opened and closed on the running loop.
+    """
+    
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
     
-    def __init__(self, delay: float = 2.0):
-        """Initialize the scraper with rate limiting."""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+    def __init__(self, delay: float = 2.0, max_retries: int = 3, backoff_factor: float = 0.5,
+                 max_backoff: float = 60.0):
+        """Initialize the scraper with rate limiting and retry settings."""
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept-Encoding': 'gzip, deflate'
+        }
         self.delay = delay
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    async def __aenter__(self) -> "RedditScraper":
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.session.close()
+        self.session = None
         
-    def scrape_profile(self, profile_url: str, max_posts: int = 50) -> List[RedditPost]:
+    async def scrape_profile(self, profile_url: str, max_posts: int = 50) -> List[RedditPost]:
         """
         Scrape Reddit profile for posts and comments.
+
+        Submitted posts and comments are fetched concurrently.
         
         Args:
             profile_url: Reddit profile URL
@@ -185,19 +321,24 @@ class RedditScraper:
         logger.info(f"Starting to scrape profile: {profile_url}")
         
         
-        if not self._is_valid_reddit_url(profile_url):
+        match = _match_profile_url(profile_url)
+        if not match:
             raise ValueError(f"Invalid Reddit profile URL: {profile_url}")
+        base_url = match.group(1)
         
         posts = []
         
         try:
          
-            posts_url = f"{profile_url.rstrip('/')}/submitted/"
-            posts.extend(self._scrape_content(posts_url, "post", max_posts // 2))
+            posts_url = f"{base_url}/submitted/"
+            posts_task = asyncio.create_task(self._scrape_content(posts_url, "post", max_posts // 2))
             
            
-            comments_url = f"{profile_url.rstrip('/')}/comments/"
-            posts.extend(self._scrape_content(comments_url, "comment", max_posts // 2))
+            comments_url = f"{base_url}/comments/"
+            comments_task = asyncio.create_task(self._scrape_content(comments_url, "comment", max_posts // 2))
+
+            for result in await asyncio.gather(posts_task, comments_task):
+                posts.extend(result)
             
         except Exception as e:
             logger.error(f"Error scraping profile: {e}")
@@ -206,15 +347,42 @@ class RedditScraper:
         logger.info(f"Successfully scraped {len(posts)} posts/comments")
         return posts
     
-    def _is_valid_reddit_url(self, url: str) -> bool:
-        """Validate Reddit profile URL."""
-        parsed = urlparse(url)
-        return (
-            parsed.netloc in ['www.reddit.com', 'reddit.com', 'old.reddit.com'] and
-            '/user/' in parsed.path
-        )
-    
-    def _scrape_content(self, url: str, content_type: str, max_items: int) -> List[RedditPost]:
+    async def _fetch_json(self, url: str) -> Any:
+        """GET a JSON URL, retrying connection, timeout, rate-limit and server errors with backoff."""
+        for attempt in range(self.max_retries + 1):
+            wait = self.backoff_factor * (2 ** attempt)
+            try:
+                async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    if response.status in self.RETRY_STATUSES and attempt < self.max_retries:
+                        retry_after = self._retry_after(response) if response.status == 429 else None
+                        if retry_after is not None:
+                            wait = min(retry_after, self.max_backoff)
+                        logger.warning(f"HTTP {response.status} from {url}, retrying in {wait:.1f}s")
+                    else:
+                        response.raise_for_status()
+                        return orjson.loads(await response.read())
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"{type(e).__name__} fetching {url}, retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        """Return the Retry-After delay in seconds, or None if absent or unparseable."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    async def _scrape_content(self, url: str, content_type: str, max_items: int) -> List[RedditPost]:
         """Scrape posts or comments from a specific URL."""
         posts = []
         
@@ -222,10 +390,7 @@ class RedditScraper:
            
             json_url = f"{url.rstrip('/')}.json"
             
-            response = self.session.get(json_url, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._fetch_json(json_url)
             
            
             if isinstance(data, dict) and 'data' in data:
@@ -242,28 +407,30 @@ class RedditScraper:
                 try:
                     post_data = item['data']
                     
+                    # Reject short posts before cleaning or building the dataclass.
+                    raw_content = post_data.get('selftext') or post_data.get('body') or ''
+                    if len(raw_content) <= 10:
+                        continue
+                    
+                    content = self._clean_content(raw_content)[:_MAX_CONTENT_CHARS]
+                    if len(content) <= 10:
+                        continue
                     
-                    post = RedditPost(
+                    posts.append(RedditPost(
                         title=post_data.get('title', post_data.get('link_title', 'No Title')),
-                        content=self._clean_content(post_data.get('selftext', post_data.get('body', ''))),
+                        content=content,
                         subreddit=post_data.get('subreddit', 'Unknown'),
                         url=f"https://reddit.com{post_data.get('permalink', '')}",
-                        timestamp=datetime.fromtimestamp(
-                            post_data.get('created_utc', 0)
-                        ).strftime('%Y-%m-%d %H:%M:%S'),
+                        timestamp=int(post_data.get('created_utc', 0)),
                         upvotes=post_data.get('score', 0),
                         post_type=content_type
-                    )
-                    
-                    
-                    if post.content.strip() and len(post.content) > 10:
-                        posts.append(post)
+                    ))
                         
                 except Exception as e:
                     logger.warning(f"Error parsing {content_type}: {e}")
                     continue
             
-            time.sleep(self.delay)  
+            await asyncio.sleep(self.delay)
             
         except Exception as e:
             logger.error(f"Error scraping {content_type} from {url}: {e}")
@@ -276,40 +443,73 @@ class RedditScraper:
             return ""
         
        
-        content = re.sub(r'\*\*(.*?)\*\*', r'\1', content)  
-        content = re.sub(r'\*(.*?)\*', r'\1', content)      
-        content = re.sub(r'~~(.*?)~~', r'\1', content)     
-        content = re.sub(r'(.*?)', r'\1', content)        
+        content = _BOLD_RE.sub(r'\1', content)
+        content = _ITALIC_RE.sub(r'\1', content)
+        content = _STRIKE_RE.sub(r'\1', content)
         
         
-        content = re.sub(r'\n\s*\n', '\n\n', content)
+        content = _BLANKLINES_RE.sub('\n\n', content)
         content = content.strip()
         
         return content
 
 
-class PersonaGenerator:
-    """Generate user personas using LangChain v0.3 and Groq."""
-    
-    def __init__(self, groq_api_key: str, model_name: str = "llama-3.3-70b-versatile"):
-        """Initialize the persona generator with latest LangChain patterns."""
-        self.llm = ChatGroq(
-            api_key=groq_api_key,
-            model=model_name,
-            temperature=0.1,
-            max_tokens=4096,
-            timeout=60,
-            max_retries=3
-        )
-        
-        self.parser = PersonaOutputParser()
-        self._setup_chain()
-    
-    def _setup_chain(self):
-        """Setup the LangChain chain for persona generation using v0.3 patterns."""
-        
-       
-        system_prompt = """
+class PersonaCache:
+    """Content-addressed disk cache for generated personas."""
+
+    def __init__(self, cache_dir: str = os.path.join(os.path.expanduser("~"), ".cache", "reddit-persona")):
+        """Initialize the cache, creating the directory if needed.
+
+        If the directory cannot be created the cache is disabled: every
+        lookup misses and nothing is written.
+        """
+        self.cache_dir = cache_dir
+        self.enabled = True
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Persona cache disabled, cannot create {self.cache_dir}: {e}")
+            self.enabled = False
+
+    @staticmethod
+    def make_key(model_name: str, posts_key: str) -> str:
+        """Build the cache key for a model and a _posts_digest of the input posts.
+
+        _INPUT_FORMAT_VERSION is mixed in so that changing how posts are
+        rendered or prompted invalidates earlier entries.
+        """
+        return hashlib.sha256((model_name + _INPUT_FORMAT_VERSION + posts_key).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[UserPersonaModel]:
+        """Return the cached persona for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            # Read bytes so a corrupt, non-UTF-8 entry fails validation
+            # instead of raising UnicodeDecodeError.
+            with open(self._path(key), 'rb') as f:
+                return UserPersonaModel.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {e}")
+            return None
+
+    def set(self, key: str, persona: UserPersonaModel) -> None:
+        """Store a persona under key."""
+        if not self.enabled:
+            return
+        try:
+            with open(self._path(key), 'w', encoding='utf-8') as f:
+                f.write(persona.model_dump_json())
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+
+
+_SYSTEM_PROMPT = """
         You are an expert user researcher and persona analyst. Your task is to analyze Reddit posts and comments to create a comprehensive, enhanced user persona.
 
         Based on the provided Reddit data, you must:
@@ -323,9 +523,8 @@ class PersonaGenerator:
 
         Return your analysis in VALID JSON format with the exact structure specified in the human message.
         """
-        
-       
-        human_prompt = """
+
+_HUMAN_PROMPT = """
         Analyze the following Reddit posts and comments to create a detailed, enhanced user persona:
 
         Reddit Data:
@@ -420,14 +619,57 @@ class PersonaGenerator:
         Keep quotes under 100 characters when possible
         Ensure JSON is valid and properly formatted
         """
+
+# Static prompts, so the template is parsed once at import time and shared.
+_PERSONA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _SYSTEM_PROMPT),
+    ("human", _HUMAN_PROMPT)
+])
+
+# Everything besides the raw posts that shapes the LLM input; part of the cache key.
+_INPUT_FORMAT_VERSION = hashlib.sha256("\x00".join((
+    _POST_TEMPLATE,
+    str(_LLM_CONTENT_CHARS),
+    _TIMESTAMP_FORMAT,
+    _SYSTEM_PROMPT,
+    _HUMAN_PROMPT,
+)).encode('utf-8')).hexdigest()
+
+
+# Transient Groq failures worth retrying; auth/validation errors are not.
+_RETRYABLE_LLM_ERRORS = (
+    TimeoutError,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+
+class PersonaGenerator:
+    """Generate user personas using LangChain v0.3 and Groq."""
+    
+    def __init__(self, groq_api_key: str, model_name: str = "llama-3.3-70b-versatile",
+                 cache: Optional[PersonaCache] = None):
+        """Initialize the persona generator with latest LangChain patterns.
+
+        If a PersonaCache is given, responses are reused for identical
+        model and input data instead of calling the LLM again.
+        """
+        self.model_name = model_name
+        self.cache = cache
+        self._formatted_posts: Dict[str, str] = {}
+        self.llm = ChatGroq(
+            api_key=groq_api_key,
+            model=model_name,
+            temperature=0.1,
+            max_tokens=4096,
+            timeout=60,
+            # Retries are handled by _invoke_chain so backoff doesn't block a thread.
+            max_retries=0
+        )
         
-     
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", human_prompt)
-        ])
-        
-       
+        self.parser = PersonaOutputParser()
+        self.prompt = _PERSONA_PROMPT
         self.chain = (
             {"reddit_data": RunnablePassthrough()}
             | self.prompt
@@ -435,216 +677,314 @@ class PersonaGenerator:
             | self.parser
         )
     
-    def generate_persona(self, posts: List[RedditPost]) -> UserPersona:
-        """Generate a user persona from Reddit posts."""
-        logger.info("Generating enhanced user persona...")
+    async def generate_personas(self, posts_per_user: List[List[RedditPost]]) -> List[Optional[UserPersonaModel]]:
+        """
+        Generate personas for several users with a single batched chain call.
+
+        Users whose batch entry failed with a transient error are retried
+        individually, concurrently, with exponential backoff.
         
+        Args:
+            posts_per_user: One list of Reddit posts per user
+            
+        Returns:
+            One persona per user, in input order; None where generation failed
+        """
+        logger.info(f"Generating {len(posts_per_user)} enhanced user personas...")
         
-        reddit_data = self._format_posts_for_llm(posts)
+        posts_keys = [_posts_digest(posts) for posts in posts_per_user]
+        results = [self._get_cached(posts_key) for posts_key in posts_keys]
         
-        try:
-            
-            result = self.chain.invoke(reddit_data)
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            reddit_data = {i: self._format_posts_for_llm(posts_per_user[i], posts_keys[i]) for i in pending}
             
-           
-            persona = UserPersona(
-                name=result.name,
-                age_range=result.age_range,
-                location=result.location,
-                occupation=result.occupation,
-                status=result.status,
-                tier=result.tier,
-                archetype=result.archetype,
-                interests=result.interests,
-                personality_traits=result.personality_traits,
-                goals=result.goals,
-                frustrations=result.frustrations,
-                preferred_subreddits=result.preferred_subreddits,
-                communication_style=result.communication_style,
-                technology_comfort=result.technology_comfort,
-                social_media_behavior=result.social_media_behavior,
-                motivations=result.motivations,
-                behavior_habits=result.behavior_habits,
-                personality_percentages=result.personality_percentages,
-                citations=result.citations
+            # chain.batch blocks; keep it off the event loop.
+            outputs = await asyncio.to_thread(
+                self.chain.batch,
+                [reddit_data[i] for i in pending],
+                config={"max_concurrency": 8},
+                return_exceptions=True
             )
             
-            logger.info("Enhanced user persona generated successfully")
-            return persona
+            outputs_by_index = dict(zip(pending, outputs))
+            retry_indices = [i for i in pending if isinstance(outputs_by_index[i], _RETRYABLE_LLM_ERRORS)]
+            retried = await asyncio.gather(
+                *(self._invoke_chain(reddit_data[i], prior_error=outputs_by_index[i]) for i in retry_indices),
+                return_exceptions=True
+            )
+            outputs_by_index.update(zip(retry_indices, retried))
             
-        except Exception as e:
-            logger.error(f"Error generating persona: {e}")
-            raise
+            for i in pending:
+                output = outputs_by_index[i]
+                if isinstance(output, Exception):
+                    logger.error(f"Error generating persona: {output}")
+                    continue
+                self._store_cached(posts_keys[i], output)
+                results[i] = output
+        
+        logger.info(f"Generated {sum(1 for r in results if r is not None)}/{len(results)} personas")
+        return results
+    
+    async def _invoke_chain(self, reddit_data: str,
+                            prior_error: Optional[BaseException] = None) -> UserPersonaModel:
+        """
+        Invoke the chain in a worker thread, retrying transient LLM errors.
+
+        If prior_error is given (the failure of this input's chain.batch
+        entry), it is replayed as attempt 1: the backoff wait comes before
+        the first call made here, and the batch call counts toward the limit.
+        """
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=wait_exponential_jitter(initial=1, max=10),
+            retry=retry_if_exception_type(_RETRYABLE_LLM_ERRORS),
+            before_sleep=before_sleep_log(logger, logging.WARNING),
+            reraise=True,
+        ):
+            with attempt:
+                if prior_error is not None and attempt.retry_state.attempt_number == 1:
+                    raise prior_error
+                return await asyncio.to_thread(self.chain.invoke, reddit_data)
+    
+    def _get_cached(self, posts_key: str) -> Optional[UserPersonaModel]:
+        """Return a cached persona for posts_key, if caching is enabled."""
+        if not self.cache:
+            return None
+        result = self.cache.get(PersonaCache.make_key(self.model_name, posts_key))
+        if result is not None:
+            logger.info("Using cached persona")
+        return result
+    
+    def _store_cached(self, posts_key: str, persona: UserPersonaModel) -> None:
+        """Cache a generated persona, if caching is enabled."""
+        # The parser's fallback persona has no citations; don't cache it.
+        if self.cache and persona.citations:
+            self.cache.set(PersonaCache.make_key(self.model_name, posts_key), persona)
     
-    def _format_posts_for_llm(self, posts: List[RedditPost]) -> str:
-        """Format posts for LLM input."""
+    def _format_posts_for_llm(self, posts: List[RedditPost], posts_key: Optional[str] = None) -> str:
+        """Format posts for LLM input, memoized on the posts' digest."""
+        if posts_key is None:
+            posts_key = _posts_digest(posts)
+        cached = self._formatted_posts.pop(posts_key, None)
+        if cached is not None:
+            # Reinsert so the entry becomes most recent; eviction drops the oldest.
+            self._formatted_posts[posts_key] = cached
+            return cached
+        
         formatted_posts = []
         
         for i, post in enumerate(posts, 1):
            
-            content = post.content[:800] + "..." if len(post.content) > 800 else post.content
+            content = post.content
+            if len(content) > _LLM_CONTENT_CHARS:
+                content = content[:_LLM_CONTENT_CHARS] + "..."
             
-            formatted_post = f"""
-            === {post.post_type.upper()} {i} ===
-            Title: {post.title}
-            Subreddit: r/{post.subreddit}
-            Content: {content}
-            Timestamp: {post.timestamp}
-            Upvotes: {post.upvotes}
-            URL: {post.url}
-            """
-            formatted_posts.append(formatted_post)
+            formatted_posts.append(_POST_TEMPLATE.format_map({
+                "post_type": post.post_type.upper(),
+                "index": i,
+                "title": post.title,
+                "subreddit": post.subreddit,
+                "content": content,
+                "timestamp": _fmt_ts(post.timestamp),
+                "upvotes": post.upvotes,
+                "url": post.url,
+            }))
         
-        return "\n".join(formatted_posts)
+        reddit_data = "\n".join(formatted_posts)
+        if len(self._formatted_posts) >= _FORMAT_CACHE_SIZE:
+            # Dicts keep insertion order; drop the least recently used entry.
+            del self._formatted_posts[next(iter(self._formatted_posts))]
+        self._formatted_posts[posts_key] = reddit_data
+        return reddit_data
 
 
 class PersonaWriter:
     """Write enhanced persona to text file with improved formatting."""
     
-    def write_persona_to_file(self, persona: UserPersona, username: str, output_dir: str = "output"):
+    def write_persona_to_file(self, persona: UserPersonaModel, username: str, output_dir: str = "output"):
         """Write enhanced persona to a text file with comprehensive formatting."""
         os.makedirs(output_dir, exist_ok=True)
         
         filename = f"{username}_persona.txt"
         filepath = os.path.join(output_dir, filename)
         
+        pct = persona.personality_percentages
+        parts: List[str] = [
+            f"USER PERSONA FOR REDDIT USER: {username}\n",
+            "=" * 60 + "\n",
+            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "=" * 60 + "\n\n",
+
+            f"""BASIC DEMOGRAPHICS
+{'-' * 20}
+Name: {persona.name}
+Age Range: {persona.age_range}
+Location: {persona.location}
+Occupation: {persona.occupation}
+Status: {persona.status}
+Tier: {persona.tier}
+Archetype: {persona.archetype}
+
+""",
+
+            "INTERESTS\n",
+            "-" * 20 + "\n",
+            self._bullets(persona.interests),
+
+            "PERSONALITY TRAITS\n",
+            "-" * 20 + "\n",
+            self._bullets(persona.personality_traits),
+
+            f"""PERSONALITY ASSESSMENT (MBTI-Style)
+{'-' * 35}
+Introversion: {pct.get('introversion', 50)}%
+  (0% = Extremely Extroverted, 100% = Extremely Introverted)
+
+Intuition: {pct.get('intuition', 50)}%
+  (0% = Extremely Sensing, 100% = Extremely Intuitive)
+
+Feeling: {pct.get('feeling', 50)}%
+  (0% = Extremely Thinking, 100% = Extremely Feeling)
+
+Perceiving: {pct.get('perceiving', 50)}%
+  (0% = Extremely Judging, 100% = Extremely Perceiving)
+
+""",
+
+            "GOALS & ASPIRATIONS\n",
+            "-" * 20 + "\n",
+            self._bullets(persona.goals),
+
+            "MOTIVATIONS (Intensity Scores)\n",
+            "-" * 30 + "\n",
+            self._bullets(
+                f"{motivation.replace('_', ' ').title()}: {intensity}/100"
+                for motivation, intensity in persona.motivations.items()
+            ),
+
+            "FRUSTRATIONS & PAIN POINTS\n",
+            "-" * 30 + "\n",
+            self._bullets(persona.frustrations),
+
+            "BEHAVIOR & HABITS\n",
+            "-" * 20 + "\n",
+            self._bullets(persona.behavior_habits),
+
+            "PREFERRED SUBREDDITS\n",
+            "-" * 20 + "\n",
+            self._bullets(f"r/{subreddit}" for subreddit in persona.preferred_subreddits),
+
+            f"""BEHAVIORAL INSIGHTS
+{'-' * 20}
+Communication Style: {persona.communication_style}
+
+Technology Comfort: {persona.technology_comfort}
+
+Social Media Behavior: {persona.social_media_behavior}
+
+""",
+
+            "SUPPORTING EVIDENCE & CITATIONS\n",
+            "=" * 35 + "\n",
+            "The following quotes from the user's posts and comments support each characteristic:\n\n",
+        ]
+
+        for category, citations in persona.citations.items():
+            if citations:  
+                label = _CITATION_LABELS.get(category) or category.upper().replace('_', ' ')
+                parts.append(f"{label}:\n")
+                parts.append(self._bullets(citations, indent="  "))
+        
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"USER PERSONA FOR REDDIT USER: {username}\n")
-            f.write("=" * 60 + "\n")
-            f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 60 + "\n\n")
-            
-          
-            f.write("BASIC DEMOGRAPHICS\n")
-            f.write("-" * 20 + "\n")
-            f.write(f"Name: {persona.name}\n")
-            f.write(f"Age Range: {persona.age_range}\n")
-            f.write(f"Location: {persona.location}\n")
-            f.write(f"Occupation: {persona.occupation}\n")
-            f.write(f"Status: {persona.status}\n")
-            f.write(f"Tier: {persona.tier}\n")
-            f.write(f"Archetype: {persona.archetype}\n\n")
-            
-          
-            f.write("INTERESTS\n")
-            f.write("-" * 20 + "\n")
-            for interest in persona.interests:
-                f.write(f"• {interest}\n")
-            f.write("\n")
-            
-            
-            f.write("PERSONALITY TRAITS\n")
-            f.write("-" * 20 + "\n")
-            for trait in persona.personality_traits:
-                f.write(f"• {trait}\n")
-            f.write("\n")
-            
-           
-            f.write("PERSONALITY ASSESSMENT (MBTI-Style)\n")
-            f.write("-" * 35 + "\n")
-            f.write(f"Introversion: {persona.personality_percentages.get('introversion', 50)}%\n")
-            f.write(f"  (0% = Extremely Extroverted, 100% = Extremely Introverted)\n\n")
-            f.write(f"Intuition: {persona.personality_percentages.get('intuition', 50)}%\n")
-            f.write(f"  (0% = Extremely Sensing, 100% = Extremely Intuitive)\n\n")
-            f.write(f"Feeling: {persona.personality_percentages.get('feeling', 50)}%\n")
-            f.write(f"  (0% = Extremely Thinking, 100% = Extremely Feeling)\n\n")
-            f.write(f"Perceiving: {persona.personality_percentages.get('perceiving', 50)}%\n")
-            f.write(f"  (0% = Extremely Judging, 100% = Extremely Perceiving)\n\n")
-            
-          
-            f.write("GOALS & ASPIRATIONS\n")
-            f.write("-" * 20 + "\n")
-            for goal in persona.goals:
-                f.write(f"• {goal}\n")
-            f.write("\n")
-            
-           
-            f.write("MOTIVATIONS (Intensity Scores)\n")
-            f.write("-" * 30 + "\n")
-            for motivation, intensity in persona.motivations.items():
-                f.write(f"• {motivation.replace('_', ' ').title()}: {intensity}/100\n")
-            f.write("\n")
-            
-            
-            f.write("FRUSTRATIONS & PAIN POINTS\n")
-            f.write("-" * 30 + "\n")
-            for frustration in persona.frustrations:
-                f.write(f"• {frustration}\n")
-            f.write("\n")
-            
-          
-            f.write("BEHAVIOR & HABITS\n")
-            f.write("-" * 20 + "\n")
-            for habit in persona.behavior_habits:
-                f.write(f"• {habit}\n")
-            f.write("\n")
-            
-         
-            f.write("PREFERRED SUBREDDITS\n")
-            f.write("-" * 20 + "\n")
-            for subreddit in persona.preferred_subreddits:
-                f.write(f"• r/{subreddit}\n")
-            f.write("\n")
-            
-           
-            f.write("BEHAVIORAL INSIGHTS\n")
-            f.write("-" * 20 + "\n")
-            f.write(f"Communication Style: {persona.communication_style}\n\n")
-            f.write(f"Technology Comfort: {persona.technology_comfort}\n\n")
-            f.write(f"Social Media Behavior: {persona.social_media_behavior}\n\n")
-            
-          
-            f.write("SUPPORTING EVIDENCE & CITATIONS\n")
-            f.write("=" * 35 + "\n")
-            f.write("The following quotes from the user's posts and comments support each characteristic:\n\n")
-            
-            for category, citations in persona.citations.items():
-                if citations:  
-                    f.write(f"{category.upper().replace('_', ' ')}:\n")
-                    for citation in citations:
-                        f.write(f"  • {citation}\n")
-                    f.write("\n")
+            f.write("".join(parts))
         
         logger.info(f"Enhanced persona written to {filepath}")
         return filepath
 
+    @staticmethod
+    def _bullets(items, indent: str = "") -> str:
+        """Render items as a bulleted section followed by a blank line."""
+        return "".join(f"{indent}• {item}\n" for item in items) + "\n"
+
 
-def process_single_user(profile_url: str, groq_api_key: str) -> str:
-    """Process a single Reddit user and generate their enhanced persona."""
+async def scrape_single_user_async(profile_url: str, scraper: RedditScraper) -> List[RedditPost]:
+    """Scrape a single Reddit user's posts and comments; empty on failure."""
   
-    username = profile_url.split('/user/')[-1].rstrip('/')
+    username = _parse_username(profile_url) or profile_url
     
     print(f"\nProcessing user: {username}")
     print("-" * 50)
     
-    
-    scraper = RedditScraper(delay=2.0)
-    generator = PersonaGenerator(groq_api_key)
-    writer = PersonaWriter()
-    
     try:
        
-        posts = scraper.scrape_profile(profile_url, max_posts=50)
-        
-        if not posts:
-            print(f"No posts found for user {username}")
-            return ""
-        
-        print(f"Found {len(posts)} posts/comments")
-        
-       
-        persona = generator.generate_persona(posts)
-        
-       
-        filepath = writer.write_persona_to_file(persona, username)
-        
-        print(f"✓ Enhanced persona generated and saved to: {filepath}")
-        return filepath
+        posts = await scraper.scrape_profile(profile_url, max_posts=50)
         
     except Exception as e:
         logger.error(f"Error processing {profile_url}: {e}")
         print(f"✗ Error processing {username}: {e}")
-        return ""
+        return []
+    
+    if not posts:
+        print(f"No posts found for user {username}")
+        return []
+    
+    print(f"Found {len(posts)} posts/comments")
+    return posts
+
+
+async def process_users_async(profile_urls: List[str], groq_api_key: str, concurrency: int = 4,
+                              cache: Optional[PersonaCache] = None) -> List[str]:
+    """
+    Generate enhanced personas for several Reddit users.
+
+    Profiles are scraped concurrently (at most ``concurrency`` at a time),
+    then all personas are generated with one batched LLM call.
+
+    Returns:
+        The written file path per profile URL, or "" where processing failed
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    generator = PersonaGenerator(groq_api_key, cache=cache)
+    writer = PersonaWriter()
+
+    async with RedditScraper(delay=2.0) as scraper:
+
+        async def bounded(profile_url: str) -> List[RedditPost]:
+            async with semaphore:
+                return await scrape_single_user_async(profile_url, scraper)
+
+        posts_per_user = await asyncio.gather(*(bounded(profile_url) for profile_url in profile_urls))
+
+    filepaths = [""] * len(profile_urls)
+    scraped = [i for i, posts in enumerate(posts_per_user) if posts]
+    if not scraped:
+        return filepaths
+
+    personas = await generator.generate_personas([posts_per_user[i] for i in scraped])
+
+    for i, persona in zip(scraped, personas):
+        profile_url = profile_urls[i]
+        username = _parse_username(profile_url) or profile_url
+        if persona is None:
+            print(f"✗ Error processing {username}: persona generation failed")
+            continue
+        try:
+            filepaths[i] = writer.write_persona_to_file(persona, username)
+            print(f"✓ Enhanced persona generated and saved to: {filepaths[i]}")
+        except Exception as e:
+            logger.error(f"Error processing {profile_url}: {e}")
+            print(f"✗ Error processing {username}: {e}")
+
+    return filepaths
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for integers of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
 def main():
@@ -652,6 +992,8 @@ def main():
     parser = argparse.ArgumentParser(description='Generate enhanced Reddit user personas')
     parser.add_argument('--url', '-u', type=str, help='Reddit profile URL to analyze')
     parser.add_argument('--max-posts', '-m', type=int, default=50, help='Maximum posts to scrape (default: 50)')
+    parser.add_argument('--concurrency', '-c', type=_positive_int, default=4, help='Maximum profiles scraped concurrently (default: 4)')
+    parser.add_argument('--no-cache', action='store_true', help='Always call the LLM instead of reusing cached personas')
     
     args = parser.parse_args()
     
@@ -665,7 +1007,7 @@ def main():
    
     if args.url:
         
-        profile_urls = [args.url]
+        profile_urls = [args.url.strip()]
     else:
         
         profile_url = input("Enter Reddit profile URL (or press Enter for default examples): ").strip()
@@ -683,12 +1025,9 @@ def main():
     print(f"Processing {len(profile_urls)} profiles...")
     print("=" * 60)
     
-    successful_processes = 0
-    
-    for profile_url in profile_urls:
-        filepath = process_single_user(profile_url, groq_api_key)
-        if filepath:
-            successful_processes += 1
+    cache = None if args.no_cache else PersonaCache()
+    filepaths = asyncio.run(process_users_async(profile_urls, groq_api_key, args.concurrency, cache))
+    successful_processes = sum(1 for filepath in filepaths if filepath)
     
     print("\n" + "=" * 60)
     print(f"Successfully processed {successful_processes}/{len(profile_urls)} profiles")